@@ -27,8 +27,12 @@ vmnotification_files=(          \
   "README.md"                   \
   "utils.py"                    \
   "vmotionator.py"           \
+  "vmotionator_api.py"       \
   "vmotionator_config.py"    \
   "vmotionator_exception.py" \
+  "vmotionator_inventory.py" \
+  "vmotionator_schedule.py"  \
+  "vmotionator_stats.py"     \
   "vmotionator_service.py"   \
 )
 for item in ${vmnotification_files[@]}; do
@@ -0,0 +1,128 @@
+"""
+Memory regression benchmark for the compact VM inventory.
+
+Loads a fake inventory through a paged property collector and checks the
+memory retained per VM with tracemalloc. Each measurement runs in a fresh
+interpreter, so the test runner's own interned strings do not skew it.
+
+    python -m unittest discover -s tests
+"""
+import gc
+import subprocess
+import sys
+import tracemalloc
+import unittest
+
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# noinspection PyUnresolvedReferences
+from pyVmomi import vim  # noqa: E402
+
+from vmotionator_inventory import Inventory  # noqa: E402
+
+BYTES_PER_VM_BUDGET = 320
+HOST_COUNT = 64
+CLUSTER_COUNT = 4
+PAGE_SIZE = 1000
+
+
+class FakeContainerView(vim.view.ContainerView):
+    def Destroy(self):
+        pass
+
+
+class FakePropertyCollector(object):
+    """ Serve generated ObjectContent pages, so only one page exists at a time. """
+    def __init__(self, vm_count: int):
+        self.vm_count = vm_count
+        self.pages = None
+
+    def _objects(self, obj_type):
+        if obj_type is vim.ClusterComputeResource:
+            for c in range(CLUSTER_COUNT):
+                yield SimpleNamespace(obj=vim.ClusterComputeResource(f"domain-c{c}"),
+                                      propSet=[SimpleNamespace(name="name", val=f"Cluster-{c:02d}")])
+        elif obj_type is vim.HostSystem:
+            for h in range(HOST_COUNT):
+                yield SimpleNamespace(obj=vim.HostSystem(f"host-{h}"),
+                                      propSet=[SimpleNamespace(name="name", val=f"esx{h:03d}.example.com"),
+                                               SimpleNamespace(name="parent",
+                                                               val=vim.ClusterComputeResource(
+                                                                   f"domain-c{h % CLUSTER_COUNT}"))])
+        else:
+            for v in range(self.vm_count):
+                yield SimpleNamespace(obj=vim.VirtualMachine(f"vm-{v}"),
+                                      propSet=[SimpleNamespace(name="name", val=f"app-server-{v:06d}"),
+                                               SimpleNamespace(name="config.template", val=False),
+                                               SimpleNamespace(name="runtime.host",
+                                                               val=vim.HostSystem(f"host-{v % HOST_COUNT}")),
+                                               SimpleNamespace(name="runtime.powerState", val="poweredOn")])
+
+    def _page(self, page_size: int):
+        objects = []
+        for obj in self.pages:
+            objects.append(obj)
+            if len(objects) == page_size:
+                break
+        return SimpleNamespace(objects=objects, token="next" if len(objects) == page_size else None)
+
+    def RetrievePropertiesEx(self, specSet, options):
+        self.page_size = options.maxObjects
+        self.pages = self._objects(specSet[0].propSet[0].type)
+        return self._page(self.page_size)
+
+    def ContinueRetrievePropertiesEx(self, token):
+        return self._page(self.page_size)
+
+
+def fake_content(vm_count: int):
+    return SimpleNamespace(propertyCollector=FakePropertyCollector(vm_count),
+                           rootFolder=None,
+                           viewManager=SimpleNamespace(
+                               CreateContainerView=lambda *args: FakeContainerView("session[fake]")))
+
+
+def measure(vm_count: int) -> float:
+    """ Memory retained by the inventory, in bytes per VM. """
+    # Warm up, pyVmomi loads the property collector types lazily
+    Inventory(page_size=PAGE_SIZE).load(fake_content(10))
+
+    content = fake_content(vm_count)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        inventory = Inventory(page_size=PAGE_SIZE).load(content)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if len(inventory) != vm_count:
+        raise RuntimeError(f"loaded {len(inventory)} VMs instead of {vm_count}")
+    return (after - before) / vm_count
+
+
+class InventoryMemoryTest(unittest.TestCase):
+    def assert_budget(self, vm_count: int):
+        result = subprocess.run([sys.executable, __file__, "--measure", str(vm_count)],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        bytes_per_vm = float(result.stdout)
+        print(f"{vm_count} VMs: {bytes_per_vm:.0f} bytes per VM")
+        self.assertLessEqual(bytes_per_vm, BYTES_PER_VM_BUDGET)
+
+    def test_10k_vms(self):
+        self.assert_budget(10000)
+
+    def test_50k_vms(self):
+        self.assert_budget(50000)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--measure":
+        print(measure(int(sys.argv[2])))
+    else:
+        unittest.main()
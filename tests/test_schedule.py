@@ -0,0 +1,193 @@
+"""
+Unit tests for the cron-like schedule windows and the scheduler.
+
+    python -m unittest discover -s tests
+"""
+import sys
+import unittest
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vmotionator_schedule import CronSpec, ScheduleWindow, Scheduler  # noqa: E402
+
+# Monday 5 January 2026
+MONDAY = datetime(2026, 1, 5)
+
+
+def window(name: str, schedule: str, interval: int = 3600, **kwargs) -> ScheduleWindow:
+    return ScheduleWindow(name=name,
+                          schedule=schedule,
+                          vmotion_interval_min_seconds=interval,
+                          vmotion_interval_max_seconds=interval,
+                          vmotion_vm_count=1,
+                          **kwargs)
+
+
+class CronSpecParseTest(unittest.TestCase):
+    def test_values_ranges_and_lists(self):
+        self.assertEqual(CronSpec.parse_field("5", 0, 59), {5})
+        self.assertEqual(CronSpec.parse_field("1-3,7", 0, 59), {1, 2, 3, 7})
+        self.assertEqual(CronSpec.parse_field("*", 0, 6), set(range(7)))
+
+    def test_steps(self):
+        self.assertEqual(CronSpec.parse_field("*/15", 0, 59), {0, 15, 30, 45})
+        self.assertEqual(CronSpec.parse_field("10-20/5", 0, 59), {10, 15, 20})
+        # A single value with a step runs to the end of the range
+        self.assertEqual(CronSpec.parse_field("50/4", 0, 59), {50, 54, 58})
+
+    def test_names(self):
+        spec = CronSpec("* * * jan,mar-may mon-fri")
+        self.assertEqual(spec.months, {1, 3, 4, 5})
+        self.assertEqual(spec.weekdays, {1, 2, 3, 4, 5})
+        self.assertEqual(CronSpec("* * * * SAT,sun").weekdays, {0, 6})
+
+    def test_weekday_7_is_sunday(self):
+        self.assertEqual(CronSpec("* * * * 7").weekdays, {0})
+        self.assertEqual(CronSpec("* * * * 5-7").weekdays, {0, 5, 6})
+
+    def test_rejects_invalid_fields(self):
+        for expression in ("* * * *",                 # missing field
+                           "* * * * * *",             # extra field
+                           "60 * * * *",              # out of range
+                           "* 24 * * *",
+                           "* * 0 * *",
+                           "* * * 13 *",
+                           "* * * * 8",
+                           "10-5 * * * *",            # reversed range
+                           "*/0 * * * *",             # null step
+                           "*/x * * * *",
+                           "* * * * funday",          # unknown name
+                           "* * * jan-foo *",
+                           "mon * * * *",             # name in a field without names
+                           "-1 * * * *"):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    CronSpec(expression)
+
+
+class CronSpecMatchTest(unittest.TestCase):
+    def test_day_and_weekday_either_matches(self):
+        # Both restricted: the 1st of the month or any Monday
+        spec = CronSpec("0 0 1 * mon")
+        self.assertTrue(spec.matches(datetime(2026, 1, 1)))       # Thursday the 1st
+        self.assertTrue(spec.matches(MONDAY))                     # Monday the 5th
+        self.assertFalse(spec.matches(datetime(2026, 1, 6)))      # Tuesday the 6th
+
+    def test_day_or_weekday_any_requires_both(self):
+        self.assertTrue(CronSpec("0 0 1 * *").matches(datetime(2026, 1, 1)))
+        self.assertFalse(CronSpec("0 0 1 * *").matches(MONDAY))
+        self.assertTrue(CronSpec("0 0 * * mon").matches(MONDAY))
+        self.assertFalse(CronSpec("0 0 * * mon").matches(datetime(2026, 1, 1)))
+
+    def test_next_match(self):
+        spec = CronSpec("30 8-17 * * mon-fri")
+        self.assertEqual(spec.next_match(MONDAY), MONDAY.replace(hour=8, minute=30))
+        # Friday evening moves to Monday morning
+        self.assertEqual(spec.next_match(datetime(2026, 1, 9, 18)), datetime(2026, 1, 12, 8, 30))
+        # Seconds are dropped, a matching minute matches itself
+        self.assertEqual(spec.next_match(MONDAY.replace(hour=9, minute=30, second=42)),
+                         MONDAY.replace(hour=9, minute=30))
+
+    def test_next_match_never(self):
+        self.assertIsNone(CronSpec("* * 31 feb *").next_match(MONDAY))
+
+    def test_next_mismatch(self):
+        spec = CronSpec("* 8-17 * * *")
+        self.assertEqual(spec.next_mismatch(MONDAY.replace(hour=9, minute=15)), MONDAY.replace(hour=18))
+        self.assertEqual(spec.next_mismatch(MONDAY.replace(hour=7)), MONDAY.replace(hour=7))
+        self.assertIsNone(CronSpec("* * * * *").next_mismatch(MONDAY))
+
+
+class ScheduleWindowTest(unittest.TestCase):
+    def test_rejects_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            window("w", "* * * * *", interval=0)
+        with self.assertRaises(ValueError):
+            ScheduleWindow("w", "* * * * *", 120, 60, 1)
+        with self.assertRaises(ValueError):
+            ScheduleWindow("w", "* * * * *", 60, 120, 0)
+        with self.assertRaises(ValueError):
+            window("w", "* * * * *", vmotion_concurrency=-1)
+
+    def test_clusters_require_blackout(self):
+        with self.assertRaises(ValueError):
+            window("w", "* * * * *", clusters=["Cluster-01"])
+        self.assertEqual(window("w", "* * * * *", blackout=True, clusters=["Cluster-01"]).clusters, ["Cluster-01"])
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.default = window("default", "* * * * *")
+
+    def test_active_window_in_order(self):
+        business = window("business", "* 8-17 * * mon-fri")
+        lunch = window("lunch", "* 12 * * *")
+        scheduler = Scheduler(self.default, [business, lunch])
+        self.assertIs(scheduler.active_window(MONDAY.replace(hour=12)), business)
+        self.assertIs(scheduler.active_window(MONDAY.replace(hour=20)), self.default)
+        self.assertIs(scheduler.active_window(datetime(2026, 1, 10, 12)), lunch)
+
+    def test_fire_after_interval(self):
+        scheduler = Scheduler(window("default", "* * * * *", interval=600))
+        fire_at, active = scheduler.next_fire(MONDAY)
+        self.assertEqual(fire_at, MONDAY + timedelta(seconds=600))
+        self.assertIs(active, scheduler.default_window)
+
+    def test_jump_to_opening_window(self):
+        night = window("night", "* 1-4 * * *", interval=60)
+        scheduler = Scheduler(self.default, [night])
+        fire_at, active = scheduler.next_fire(MONDAY.replace(minute=50))
+        self.assertEqual(fire_at, MONDAY.replace(hour=1))
+        self.assertIs(active, night)
+
+    def test_no_jump_when_interval_expires_first(self):
+        night = window("night", "* 1-4 * * *", interval=60)
+        scheduler = Scheduler(window("default", "* * * * *", interval=600), [night])
+        fire_at, active = scheduler.next_fire(MONDAY)
+        self.assertEqual(fire_at, MONDAY + timedelta(seconds=600))
+        self.assertIs(active, scheduler.default_window)
+
+    def test_fire_moved_past_blackout(self):
+        backup = window("backup", "* 2 * * *", blackout=True)
+        scheduler = Scheduler(window("default", "* * * * *", interval=120), [backup])
+        self.assertTrue(scheduler.in_blackout(MONDAY.replace(hour=2, minute=30)))
+        self.assertFalse(scheduler.in_blackout(MONDAY.replace(hour=3)))
+        fire_at, active = scheduler.next_fire(MONDAY.replace(hour=1, minute=59))
+        self.assertEqual(fire_at, MONDAY.replace(hour=3))
+        self.assertIs(active, scheduler.default_window)
+
+    def test_consecutive_blackouts(self):
+        first = window("first", "* 2 * * *", blackout=True)
+        second = window("second", "* 3-4 * * *", blackout=True)
+        scheduler = Scheduler(self.default, [first, second])
+        self.assertEqual(scheduler.blackout_end(MONDAY.replace(hour=2, minute=10)), MONDAY.replace(hour=5))
+        self.assertEqual(scheduler.blackout_end(MONDAY.replace(hour=1)), MONDAY.replace(hour=1))
+
+    def test_blackout_that_never_ends(self):
+        scheduler = Scheduler(self.default, [window("always", "* * * * *", blackout=True)])
+        self.assertIsNone(scheduler.blackout_end(MONDAY))
+        self.assertEqual(scheduler.next_fire(MONDAY), (None, self.default))
+
+    def test_chained_blackouts_that_never_end(self):
+        morning = window("morning", "* 0-11 * * *", blackout=True)
+        afternoon = window("afternoon", "* 12-23 * * *", blackout=True)
+        scheduler = Scheduler(self.default, [morning, afternoon])
+        self.assertIsNone(scheduler.blackout_end(MONDAY))
+        fire_at, _ = scheduler.next_fire(MONDAY)
+        self.assertIsNone(fire_at)
+
+    def test_cluster_blackouts(self):
+        finance = window("finance", "* * 25-31 * *", blackout=True, clusters=["Finance"])
+        scheduler = Scheduler(self.default, [finance])
+        self.assertEqual(scheduler.blackout_clusters(datetime(2026, 1, 26)), {"Finance"})
+        self.assertEqual(scheduler.blackout_clusters(MONDAY), set())
+        # Cluster blackouts do not suspend the other clusters
+        self.assertFalse(scheduler.in_blackout(datetime(2026, 1, 26)))
+        self.assertEqual(scheduler.next_fire(datetime(2026, 1, 26))[0], datetime(2026, 1, 26, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,7 @@ from configparser import NoOptionError
 from pathlib import Path
 
 from utils import create_folders, get_logging_level
+from vmotionator_api import VMotionatorApi
 from vmotionator_config import VMotionatorConfig
 from vmotionator_service import VMotionatorService
 
@@ -49,6 +50,12 @@ def main():
     # Get CLI input
     parser = argparse.ArgumentParser(prog='vmotionator', description='Random vMotion Service for Linux')
     parser.add_argument('-c', '--config', type=str, required=True)
+    subparsers = parser.add_subparsers(dest='command')
+    evacuate_parser = subparsers.add_parser('evacuate', help='Move all the VMs off the given host(s) and exit')
+    evacuate_parser.add_argument('--host', type=str, action='append', required=True, dest='hosts', metavar='HOST',
+                                 help='Host to evacuate (can be repeated)')
+    evacuate_parser.add_argument('--concurrency', type=int, default=None,
+                                 help='Concurrent vMotions per host (default: host maximum)')
     args = parser.parse_args()
     config_file = args.config
 
@@ -62,7 +69,7 @@ def main():
     try:
         config = VMotionatorConfig(config_file=config_file)
         config.print()
-    except NoOptionError as e:
+    except (NoOptionError, ValueError) as e:
         print(f"Error: Configuration file '{config_file}': {e}")
         exit(1)
 
@@ -92,6 +99,7 @@ def main():
     logger.debug(f"Minimum wait time: {config.vmotion_interval_min_seconds}")
     logger.debug(f"Maximum wait time: {config.vmotion_interval_max_seconds}")
     logger.debug(f"Number of VM(s) to migrate per interval: {config.vmotion_vm_count}")
+    logger.debug(f"Schedule windows: {[window.name for window in config.schedule_windows]}")
     logger_vmotion.debug("Starting vMotionator service")
 
     obj = VMotionatorService(vmotion_interval_min_seconds=config.vmotion_interval_min_seconds,
@@ -102,8 +110,39 @@ def main():
                              vcenter_username=config.vcenter_username,
                              vcenter_password=config.vcenter_password,
                              vcenter_port=config.vcenter_port,
-                             vcenter_ssl_verify=config.vcenter_ssl_verify)
-    obj.run()
+                             vcenter_ssl_verify=config.vcenter_ssl_verify,
+                             vmotion_concurrency=config.vmotion_concurrency,
+                             schedule_windows=config.schedule_windows,
+                             vmotion_stats_window=config.vmotion_stats_window,
+                             inventory_cache_seconds=config.inventory_cache_seconds)
+
+    # Evacuate hosts and exit
+    if args.command == 'evacuate':
+        if args.concurrency is not None and args.concurrency < 1:
+            print(f"Error: --concurrency must be greater than 0 (input: {args.concurrency})")
+            exit(1)
+        _, _, evacuated = obj.evacuate_hosts(host_names=args.hosts, concurrency=args.concurrency)
+        exit(0 if evacuated else 1)
+
+    # Start the control API
+    api = None
+    if config.api_enabled:
+        if config.api_transport == "unix":
+            create_folders(config.api_socket)
+        else:
+            logger.warning(f"The control API on '{config.api_address}:{config.api_port}' is not authenticated, "
+                           f"any local user can trigger vMotions")
+        api = VMotionatorApi(service=obj,
+                             address=config.api_address,
+                             port=config.api_port,
+                             socket_path=config.api_socket if config.api_transport == "unix" else None)
+        api.start()
+
+    try:
+        obj.run()
+    finally:
+        if api:
+            api.stop()
 
 
 if __name__ == "__main__":
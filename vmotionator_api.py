@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import socketserver
+import threading
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from vmotionator_exception import VMotionatorException
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON control API.
+
+    GET  /status          service status, queue depth, in-flight vMotions, inventory age
+    GET  /stats           rolling vMotion statistics
+    POST /batch           {"count": n}            run a vMotion batch now (409 during a blackout)
+    POST /vms             {"vms": [name, ...]}    vMotion the given VMs now, ignoring blackouts
+    POST /hosts           {"hosts": [name, ...]}  move all the VMs off the given hosts, ignoring blackouts
+    POST /pause           pause the scheduled vMotions
+    POST /resume          resume the scheduled vMotions
+    """
+    server_version = "vmotionator"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    # Unix sockets have no client address
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send(self, status: HTTPStatus, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Optional[dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"request body larger than {MAX_BODY_BYTES} bytes")
+        if length == 0:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    @classmethod
+    def _names(cls, body: dict, key: str):
+        names = body.get(key)
+        if not isinstance(names, list) or not names or not all(isinstance(n, str) for n in names):
+            raise ValueError(f"'{key}' must be a non-empty list of strings")
+        return names
+
+    def do_GET(self):
+        match self.path.rstrip("/"):
+            case "/status":
+                self._send(HTTPStatus.OK, self.service.status())
+            case "/stats":
+                self._send(HTTPStatus.OK, self.service.stats.json())
+            case _:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown path '{self.path}'"})
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+            match self.path.rstrip("/"):
+                case "/batch":
+                    count = body.get("count")
+                    if count is not None and (isinstance(count, bool) or not isinstance(count, int) or count < 1):
+                        raise ValueError("'count' must be an int greater than 0")
+                    self.service.request_batch(count)
+                case "/vms":
+                    self.service.request_vms(self._names(body, "vms"))
+                case "/hosts":
+                    self.service.request_hosts(self._names(body, "hosts"))
+                case "/pause":
+                    self.service.pause()
+                case "/resume":
+                    self.service.resume()
+                case _:
+                    self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown path '{self.path}'"})
+                    return
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        except VMotionatorException as e:
+            self._send(HTTPStatus.CONFLICT, {"error": str(e)})
+            return
+        self._send(HTTPStatus.ACCEPTED, self.service.status())
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class VMotionatorApi(object):
+    """ Serve the control API from a background thread, over TCP or a Unix socket. """
+    def __init__(self, service, address: str = "127.0.0.1", port: int = 8080, socket_path: str = None):
+        self.service = service
+        self.address = address
+        self.port = port
+        self.socket_path = socket_path
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.server = ThreadingUnixHTTPServer(self.socket_path, ApiRequestHandler)
+            os.chmod(self.socket_path, 0o660)
+            logger.info(f"start: Control API listening on unix socket '{self.socket_path}'")
+        else:
+            self.server = ThreadingHTTPServer((self.address, self.port), ApiRequestHandler)
+            logger.info(f"start: Control API listening on '{self.address}:{self.port}'")
+        self.server.service = self.service
+        self.thread = threading.Thread(target=self.server.serve_forever, name="vmotionator-api", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.server:
+            return
+        logger.debug(f"stop: Stopping control API")
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = None
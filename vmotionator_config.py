@@ -3,9 +3,14 @@ import hashlib
 
 from typing import List
 
+from vmotionator_inventory import DEFAULT_INVENTORY_CACHE_SECONDS
+from vmotionator_schedule import ScheduleWindow
+
 DEFAULT_VMOTION_INTERVAL_MIN_SECONDS = 900      # 15 minutes
 DEFAULT_VMOTION_INTERVAL_MAX_SECONDS = 1200     # 20 minutes
 DEFAULT_VMOTION_VM_COUNT = 1                    # number of VM to vmotion
+DEFAULT_VMOTION_CONCURRENCY = 0                 # concurrent vmotions, 0 = all at once
+DEFAULT_VMOTION_STATS_WINDOW = 100              # vmotions kept per cluster / host pair for the statistics
 DEFAULT_VMOTION_VM_EXCLUSIONS = """
 vCLS
 SupervisorControlPlaneVM
@@ -21,6 +26,14 @@ DEFAULT_SERVICE_LOGFILE_COUNT = 10
 DEFAULT_VMOTION_LOGFILE = "/var/log/vmotionator/vmotion.log"
 DEFAULT_VMOTION_LOGFILE_MAXSIZE_BYTES = 20 * 1024 * 1024
 DEFAULT_VMOTION_LOGFILE_COUNT = 10
+DEFAULT_API_ENABLED = False
+DEFAULT_API_TRANSPORT = "unix"
+API_TRANSPORTS = ("unix", "tcp")
+DEFAULT_API_ADDRESS = "127.0.0.1"
+DEFAULT_API_PORT = 8080
+DEFAULT_API_SOCKET = "/run/vmotionator/api.sock"
+DEFAULT_WINDOW_BLACKOUT = False
+WINDOW_SECTION_PREFIX = "WINDOW "
 
 
 class VMotionatorConfig(object):
@@ -40,15 +53,39 @@ class VMotionatorConfig(object):
                                                                option="vmotion_interval_max_seconds",
                                                                fallback=DEFAULT_VMOTION_INTERVAL_MAX_SECONDS)
 
+        if self.vmotion_interval_max_seconds < self.vmotion_interval_min_seconds:
+            raise ValueError(f"vmotion_interval_max_seconds must be greater or equal to "
+                             f"vmotion_interval_min_seconds (input: {self.vmotion_interval_max_seconds})")
+
         self.vmotion_vm_count = self.config.getint(section="DEFAULT",
                                                    option="vmotion_vm_count",
                                                    fallback=DEFAULT_VMOTION_VM_COUNT)
 
+        self.vmotion_concurrency = self.config.getint(section="DEFAULT",
+                                                      option="vmotion_concurrency",
+                                                      fallback=DEFAULT_VMOTION_CONCURRENCY)
+
+        self.vmotion_stats_window = self.config.getint(section="DEFAULT",
+                                                       option="vmotion_stats_window",
+                                                       fallback=DEFAULT_VMOTION_STATS_WINDOW)
+
+        self.inventory_cache_seconds = self.config.getint(section="DEFAULT",
+                                                          option="inventory_cache_seconds",
+                                                          fallback=DEFAULT_INVENTORY_CACHE_SECONDS)
+
         raw_list = self.config.get(section="DEFAULT",
                                    option="vmotion_vm_exclusions",
                                    fallback=DEFAULT_VMOTION_VM_EXCLUSIONS)
         self.vmotion_vm_exclusions = [item.strip() for item in raw_list.strip().splitlines() if item.strip()]
 
+        #
+        # Schedule Windows
+        #
+        # Options missing from a window section are inherited from the DEFAULT section.
+        self.schedule_windows = [self.parse_window(section)
+                                 for section in self.config.sections()
+                                 if section.startswith(WINDOW_SECTION_PREFIX)]
+
         #
         # vCenter Server
         #
@@ -69,6 +106,32 @@ class VMotionatorConfig(object):
                                                          option="vcenter_ssl_verify",
                                                          fallback=DEFAULT_VCENTER_SSL_VERIFY)
 
+        #
+        # Control API
+        #
+        self.api_enabled = self.config.getboolean(section="API",
+                                                  option="api_enabled",
+                                                  fallback=DEFAULT_API_ENABLED)
+
+        self.api_transport = self.config.get(section="API",
+                                             option="api_transport",
+                                             fallback=DEFAULT_API_TRANSPORT)
+
+        self.api_address = self.config.get(section="API",
+                                           option="api_address",
+                                           fallback=DEFAULT_API_ADDRESS)
+
+        self.api_port = self.config.getint(section="API",
+                                           option="api_port",
+                                           fallback=DEFAULT_API_PORT)
+
+        self.api_socket = self.config.get(section="API",
+                                          option="api_socket",
+                                          fallback=DEFAULT_API_SOCKET)
+
+        if self.api_transport == "unix" and not self.api_socket:
+            raise ValueError("api_socket must be set when api_transport is 'unix'")
+
         #
         # Logging Section
         #
@@ -110,11 +173,20 @@ class VMotionatorConfig(object):
             "vmotion_interval_min_seconds": self.vmotion_interval_min_seconds,
             "vmotion_interval_max_seconds": self.vmotion_interval_max_seconds,
             "vmotion_vm_count": self.vmotion_vm_count,
+            "vmotion_concurrency": self.vmotion_concurrency,
+            "vmotion_stats_window": self.vmotion_stats_window,
+            "inventory_cache_seconds": self.inventory_cache_seconds,
+            "schedule_windows": [window.json() for window in self.schedule_windows],
             "vcenter_server": self.vcenter_server,
             "vcenter_username": self.vcenter_username,
             "vcenter_password": self.hash(self.vcenter_password) if hash_password else self.vcenter_password,
             "vcenter_port": self.vcenter_port,
             "vcenter_ssl_verify": self.vcenter_ssl_verify,
+            "api_enabled": self.api_enabled,
+            "api_transport": self.api_transport,
+            "api_address": self.api_address,
+            "api_port": self.api_port,
+            "api_socket": self.api_socket,
             "service_logfile": self.service_logfile,
             "service_logfile_level": self.service_logfile_level,
             "service_console_level": self.service_console_level,
@@ -129,6 +201,29 @@ class VMotionatorConfig(object):
         for k, v in self.json().items():
             print(f"{k}: '{v}'")
 
+    def parse_window(self, section: str) -> ScheduleWindow:
+        raw_list = self.config.get(section=section, option="clusters", fallback="")
+        return ScheduleWindow(name=section[len(WINDOW_SECTION_PREFIX):].strip(),
+                              schedule=self.config.get(section=section, option="schedule"),
+                              vmotion_interval_min_seconds=self.config.getint(
+                                  section=section,
+                                  option="vmotion_interval_min_seconds",
+                                  fallback=DEFAULT_VMOTION_INTERVAL_MIN_SECONDS),
+                              vmotion_interval_max_seconds=self.config.getint(
+                                  section=section,
+                                  option="vmotion_interval_max_seconds",
+                                  fallback=DEFAULT_VMOTION_INTERVAL_MAX_SECONDS),
+                              vmotion_vm_count=self.config.getint(section=section,
+                                                                  option="vmotion_vm_count",
+                                                                  fallback=DEFAULT_VMOTION_VM_COUNT),
+                              vmotion_concurrency=self.config.getint(section=section,
+                                                                     option="vmotion_concurrency",
+                                                                     fallback=DEFAULT_VMOTION_CONCURRENCY),
+                              blackout=self.config.getboolean(section=section,
+                                                              option="blackout",
+                                                              fallback=DEFAULT_WINDOW_BLACKOUT),
+                              clusters=[item.strip() for item in raw_list.strip().splitlines() if item.strip()])
+
     @classmethod
     def hash(cls, data: str) -> str:
        return hashlib.sha256(bytes(data, "utf-8")).hexdigest()
@@ -169,6 +264,42 @@ class VMotionatorConfig(object):
             raise ValueError(f"vmotion_vm_count must be greater than 0 (input: {vmotion_vm_count})")
         self._vmotion_vm_count = vmotion_vm_count
 
+    @property
+    def vmotion_concurrency(self) -> int:
+        return self._vmotion_concurrency
+
+    @vmotion_concurrency.setter
+    def vmotion_concurrency(self, vmotion_concurrency: int):
+        if not isinstance(vmotion_concurrency, int):
+            raise ValueError(f"vmotion_concurrency must be an int (input: '{vmotion_concurrency}')")
+        if vmotion_concurrency < 0:
+            raise ValueError(f"vmotion_concurrency must be 0 or greater (input: {vmotion_concurrency})")
+        self._vmotion_concurrency = vmotion_concurrency
+
+    @property
+    def vmotion_stats_window(self) -> int:
+        return self._vmotion_stats_window
+
+    @vmotion_stats_window.setter
+    def vmotion_stats_window(self, vmotion_stats_window: int):
+        if not isinstance(vmotion_stats_window, int):
+            raise ValueError(f"vmotion_stats_window must be an int (input: '{vmotion_stats_window}')")
+        if vmotion_stats_window < 1:
+            raise ValueError(f"vmotion_stats_window must be greater than 0 (input: {vmotion_stats_window})")
+        self._vmotion_stats_window = vmotion_stats_window
+
+    @property
+    def inventory_cache_seconds(self) -> int:
+        return self._inventory_cache_seconds
+
+    @inventory_cache_seconds.setter
+    def inventory_cache_seconds(self, inventory_cache_seconds: int):
+        if not isinstance(inventory_cache_seconds, int):
+            raise ValueError(f"inventory_cache_seconds must be an int (input: '{inventory_cache_seconds}')")
+        if inventory_cache_seconds < 0:
+            raise ValueError(f"inventory_cache_seconds must be 0 or greater (input: {inventory_cache_seconds})")
+        self._inventory_cache_seconds = inventory_cache_seconds
+
     @property
     def vmotion_vm_exclusions(self) -> List[str]:
         return self._vmotion_vm_exclusions
@@ -235,6 +366,56 @@ class VMotionatorConfig(object):
             raise ValueError(f"vcenter_ssl_verify must be a boolean (input: '{vcenter_ssl_verify}')")
         self._vcenter_ssl_verify = vcenter_ssl_verify
 
+    @property
+    def api_enabled(self) -> bool:
+        return self._api_enabled
+
+    @api_enabled.setter
+    def api_enabled(self, api_enabled: bool):
+        if not isinstance(api_enabled, bool):
+            raise ValueError(f"api_enabled must be a boolean (input: '{api_enabled}')")
+        self._api_enabled = api_enabled
+
+    @property
+    def api_transport(self) -> str:
+        return self._api_transport
+
+    @api_transport.setter
+    def api_transport(self, api_transport: str):
+        if api_transport not in API_TRANSPORTS:
+            raise ValueError(f"api_transport must be one of {", ".join(API_TRANSPORTS)} (input: '{api_transport}')")
+        self._api_transport = api_transport
+
+    @property
+    def api_address(self) -> str:
+        return self._api_address
+
+    @api_address.setter
+    def api_address(self, api_address: str):
+        if not isinstance(api_address, str):
+            raise ValueError(f"api_address must be a string (input: '{api_address}')")
+        self._api_address = api_address
+
+    @property
+    def api_port(self) -> int:
+        return self._api_port
+
+    @api_port.setter
+    def api_port(self, api_port: int):
+        if api_port < 1 or api_port > 65535:
+            raise ValueError(f"api_port must be in [1, 65535] (was {api_port}).")
+        self._api_port = api_port
+
+    @property
+    def api_socket(self) -> str:
+        return self._api_socket
+
+    @api_socket.setter
+    def api_socket(self, api_socket: str):
+        if not isinstance(api_socket, str):
+            raise ValueError(f"api_socket must be a string (input: '{api_socket}')")
+        self._api_socket = api_socket
+
     @property
     def service_logfile(self) -> str:
         return self._service_logfile
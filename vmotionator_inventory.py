@@ -0,0 +1,178 @@
+import logging
+import sys
+import time
+
+# noinspection PyUnresolvedReferences
+from pyVmomi import vim, vmodl
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of objects returned by the property collector per page
+DEFAULT_PAGE_SIZE = 1000
+
+# Age after which the inventory is reloaded from vCenter
+DEFAULT_INVENTORY_CACHE_SECONDS = 300
+
+VM_PROPERTIES = ["name", "config.template", "runtime.host", "runtime.powerState"]
+HOST_PROPERTIES = ["name", "parent"]
+CLUSTER_PROPERTIES = ["name"]
+
+
+class VMRecord(object):
+    """
+    Compact view of a virtual machine.
+
+    Only the fields used by the service are kept. The MoRef IDs and the
+    power state are interned, so the host, cluster and power state strings
+    are shared between all the VMs that reference them.
+    """
+    __slots__ = ("moref", "name", "template", "host", "cluster", "power_state")
+
+    def __init__(self,
+                 moref: str,
+                 name: str,
+                 template: bool,
+                 host: Optional[str],
+                 cluster: Optional[str],
+                 power_state: Optional[str]):
+        self.moref = sys.intern(moref)
+        self.name = name
+        self.template = template
+        self.host = sys.intern(host) if host else None
+        self.cluster = sys.intern(cluster) if cluster else None
+        self.power_state = sys.intern(power_state) if power_state else None
+
+    def __repr__(self):
+        return f"VMRecord('{self.moref}', '{self.name}', host='{self.host}', cluster='{self.cluster}')"
+
+
+class Inventory(object):
+    """
+    vCenter inventory reduced to VM records and host/cluster name lookups.
+
+    The inventory is loaded with the property collector, one page at a
+    time, so that no pyVmomi proxy or property tree is kept once a page
+    has been converted to records.
+    """
+    def __init__(self, page_size: int = DEFAULT_PAGE_SIZE):
+        self.page_size = page_size
+        self.vms: List[VMRecord] = []
+        self.host_names: Dict[str, str] = {}
+        self.host_cluster: Dict[str, Optional[str]] = {}
+        self.cluster_names: Dict[str, str] = {}
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self.vms)
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self.loaded_at is None:
+            return None
+        return time.monotonic() - self.loaded_at
+
+    def host_name(self, moref: Optional[str]) -> str:
+        return self.host_names.get(moref, moref)
+
+    def cluster_name(self, moref: Optional[str]) -> str:
+        return self.cluster_names.get(moref, moref)
+
+    def load(self, content) -> "Inventory":
+        logger.debug(f"load: Loading inventory (page size: {self.page_size})")
+        vms: List[VMRecord] = []
+        host_names: Dict[str, str] = {}
+        host_cluster: Dict[str, Optional[str]] = {}
+        cluster_names: Dict[str, str] = {}
+
+        for obj in self.__retrieve(content, vim.ClusterComputeResource, CLUSTER_PROPERTIES):
+            props = {prop.name: prop.val for prop in obj.propSet}
+            cluster_names[sys.intern(obj.obj._moId)] = sys.intern(props.get("name", obj.obj._moId))
+
+        for obj in self.__retrieve(content, vim.HostSystem, HOST_PROPERTIES):
+            props = {prop.name: prop.val for prop in obj.propSet}
+            moref = sys.intern(obj.obj._moId)
+            parent = props.get("parent")
+            host_names[moref] = sys.intern(props.get("name", moref))
+            host_cluster[moref] = (sys.intern(parent._moId)
+                                   if isinstance(parent, vim.ClusterComputeResource) else None)
+
+        for obj in self.__retrieve(content, vim.VirtualMachine, VM_PROPERTIES):
+            props = {prop.name: prop.val for prop in obj.propSet}
+            host = props.get("runtime.host")
+            host_moref = host._moId if host else None
+            vms.append(VMRecord(moref=obj.obj._moId,
+                                name=props.get("name", obj.obj._moId),
+                                template=bool(props.get("config.template", False)),
+                                host=host_moref,
+                                cluster=host_cluster.get(host_moref),
+                                power_state=props.get("runtime.powerState")))
+
+        self.vms = vms
+        self.host_names = host_names
+        self.host_cluster = host_cluster
+        self.cluster_names = cluster_names
+        self.loaded_at = time.monotonic()
+        logger.debug(f"load: Loaded {len(vms)} VMs, {len(host_names)} hosts and {len(cluster_names)} clusters")
+        return self
+
+    def refresh(self, content, vms: List[VMRecord]) -> List[VMRecord]:
+        """
+        Read the current host and power state of 'vms' again, as DRS may
+        have moved them since the inventory was loaded. Return the VMs that
+        still exist.
+        """
+        if not vms:
+            return []
+        records = {vm.moref: vm for vm in vms}
+        object_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=vim.VirtualMachine(moref), skip=False)
+                        for moref in records]
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.VirtualMachine,
+                                                                   pathSet=["runtime.host", "runtime.powerState"],
+                                                                   all=False)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=object_specs,
+                                                               propSet=[property_spec],
+                                                               reportMissingObjectsInResults=True)
+        found: List[VMRecord] = []
+        for obj in self.__collect(content, filter_spec):
+            vm = records.get(obj.obj._moId)
+            if vm is None or not obj.propSet:
+                continue
+            props = {prop.name: prop.val for prop in obj.propSet}
+            host = props.get("runtime.host")
+            vm.host = sys.intern(host._moId) if host else None
+            vm.cluster = self.host_cluster.get(vm.host)
+            power_state = props.get("runtime.powerState")
+            vm.power_state = sys.intern(power_state) if power_state else None
+            found.append(vm)
+        logger.debug(f"refresh: Refreshed {len(found)}/{len(vms)} VMs")
+        return found
+
+    def __retrieve(self, content, obj_type, properties: List[str]) -> Iterator:
+        view = content.viewManager.CreateContainerView(content.rootFolder, [obj_type], True)
+        try:
+            traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(name="traverseEntities",
+                                                                         path="view",
+                                                                         skip=False,
+                                                                         type=vim.view.ContainerView)
+            object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view,
+                                                                   skip=True,
+                                                                   selectSet=[traversal_spec])
+            property_spec = vmodl.query.PropertyCollector.PropertySpec(type=obj_type,
+                                                                       pathSet=properties,
+                                                                       all=False)
+            filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[object_spec],
+                                                                   propSet=[property_spec])
+            yield from self.__collect(content, filter_spec)
+        finally:
+            view.Destroy()
+
+    def __collect(self, content, filter_spec) -> Iterator:
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=self.page_size)
+        collector = content.propertyCollector
+        result = collector.RetrievePropertiesEx(specSet=[filter_spec], options=options)
+        while result:
+            yield from result.objects
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(token=result.token)
@@ -0,0 +1,240 @@
+import logging
+import random
+
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Longest span we scan when searching for the next/last matching minute
+SEARCH_HORIZON = timedelta(days=366 * 5)
+
+WEEKDAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+MONTH_NAMES = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+               "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
+
+
+class CronSpec(object):
+    """
+    Cron-like expression 'minute hour day month weekday'.
+
+    A window is active during every minute matched by the expression, e.g.
+    '* 8-17 * * mon-fri' is active on weekdays from 08:00 to 17:59.
+    Fields accept '*', 'a', 'a-b', '*/n', 'a-b/n' and comma separated lists.
+    Weekdays are 0-6 (0 or 7 is Sunday), names are accepted for weekdays
+    and months.
+    """
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"schedule must have 5 fields 'minute hour day month weekday' (input: '{expression}')")
+        self.expression = expression
+        self.minutes = self.parse_field(fields[0], 0, 59)
+        self.hours = self.parse_field(fields[1], 0, 23)
+        self.days = self.parse_field(fields[2], 1, 31)
+        self.months = self.parse_field(fields[3], 1, 12, MONTH_NAMES)
+        self.weekdays = frozenset(d % 7 for d in self.parse_field(fields[4], 0, 7, WEEKDAY_NAMES))
+        self.days_any = fields[2] == "*"
+        self.weekdays_any = fields[4] == "*"
+        self.all_minutes = len(self.minutes) == 60
+        self.all_hours = len(self.hours) == 24
+
+    def __repr__(self):
+        return f"CronSpec('{self.expression}')"
+
+    @classmethod
+    def parse_field(cls, field: str, low: int, high: int, names: dict = None) -> FrozenSet[int]:
+        def value(token: str) -> int:
+            token = token.lower()
+            if names and token in names:
+                return names[token]
+            if not token.isdigit():
+                raise ValueError(f"invalid schedule value '{token}'")
+            return int(token)
+
+        values: Set[int] = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                if not step_str.isdigit() or int(step_str) < 1:
+                    raise ValueError(f"invalid schedule step '{step_str}'")
+                step = int(step_str)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (value(v) for v in part.split("-", 1))
+            else:
+                start = value(part)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"schedule range '{part}' must be within [{low}, {high}]")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def day_matches(self, dt: datetime) -> bool:
+        # Standard cron semantics: when both day and weekday are
+        # restricted, either one matching is enough.
+        in_days = dt.day in self.days
+        in_weekdays = dt.isoweekday() % 7 in self.weekdays
+        if self.days_any or self.weekdays_any:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def matches(self, dt: datetime) -> bool:
+        return (dt.month in self.months
+                and self.day_matches(dt)
+                and dt.hour in self.hours
+                and dt.minute in self.minutes)
+
+    def next_match(self, dt: datetime) -> Optional[datetime]:
+        """ First minute at or after 'dt' matched by the expression. """
+        dt = dt.replace(second=0, microsecond=0)
+        limit = dt + SEARCH_HORIZON
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        return None
+
+    def next_mismatch(self, dt: datetime) -> Optional[datetime]:
+        """ First minute at or after 'dt' not matched by the expression. """
+        dt = dt.replace(second=0, microsecond=0)
+        limit = dt + SEARCH_HORIZON
+        while dt < limit:
+            if not self.matches(dt):
+                return dt
+            if self.all_minutes and self.all_hours:
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif self.all_minutes:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            else:
+                dt += timedelta(minutes=1)
+        return None
+
+
+class ScheduleWindow(object):
+    def __init__(self,
+                 name: str,
+                 schedule: str,
+                 vmotion_interval_min_seconds: int,
+                 vmotion_interval_max_seconds: int,
+                 vmotion_vm_count: int,
+                 vmotion_concurrency: int = 0,
+                 blackout: bool = False,
+                 clusters: List[str] = None):
+        if vmotion_interval_min_seconds < 1:
+            raise ValueError(f"window '{name}': vmotion_interval_min_seconds must be greater than 0 "
+                             f"(input: {vmotion_interval_min_seconds})")
+        if vmotion_interval_max_seconds < vmotion_interval_min_seconds:
+            raise ValueError(f"window '{name}': vmotion_interval_max_seconds must be greater or equal to "
+                             f"vmotion_interval_min_seconds (input: {vmotion_interval_max_seconds})")
+        if vmotion_vm_count < 1:
+            raise ValueError(f"window '{name}': vmotion_vm_count must be greater than 0 (input: {vmotion_vm_count})")
+        if vmotion_concurrency < 0:
+            raise ValueError(f"window '{name}': vmotion_concurrency must be 0 or greater "
+                             f"(input: {vmotion_concurrency})")
+        if clusters and not blackout:
+            raise ValueError(f"window '{name}': clusters is only supported with blackout = yes")
+        self.name = name
+        self.spec = CronSpec(schedule)
+        self.vmotion_interval_min_seconds = vmotion_interval_min_seconds
+        self.vmotion_interval_max_seconds = vmotion_interval_max_seconds
+        self.vmotion_vm_count = vmotion_vm_count
+        self.vmotion_concurrency = vmotion_concurrency
+        self.blackout = blackout
+        self.clusters = clusters or []
+
+    def __repr__(self):
+        return f"ScheduleWindow('{self.name}', '{self.spec.expression}')"
+
+    def json(self):
+        return {
+            "name": self.name,
+            "schedule": self.spec.expression,
+            "vmotion_interval_min_seconds": self.vmotion_interval_min_seconds,
+            "vmotion_interval_max_seconds": self.vmotion_interval_max_seconds,
+            "vmotion_vm_count": self.vmotion_vm_count,
+            "vmotion_concurrency": self.vmotion_concurrency,
+            "blackout": self.blackout,
+            "clusters": self.clusters,
+        }
+
+
+class Scheduler(object):
+    """
+    Pick the next vMotion time from the configured windows.
+
+    Windows are evaluated in configuration order and the first active
+    migration window wins; the default window (always active) is used
+    otherwise. Blackout windows without clusters suspend all migrations,
+    blackout windows with clusters only exclude these clusters.
+    """
+    def __init__(self, default_window: ScheduleWindow, windows: List[ScheduleWindow] = None):
+        windows = windows or []
+        self.default_window = default_window
+        self.windows = [w for w in windows if not w.blackout]
+        self.blackouts = [w for w in windows if w.blackout and not w.clusters]
+        self.cluster_blackouts = [w for w in windows if w.blackout and w.clusters]
+
+    def active_window(self, at: datetime) -> ScheduleWindow:
+        for window in self.windows:
+            if window.spec.matches(at):
+                return window
+        return self.default_window
+
+    def blackout_clusters(self, at: datetime) -> Set[str]:
+        clusters: Set[str] = set()
+        for window in self.cluster_blackouts:
+            if window.spec.matches(at):
+                clusters.update(window.clusters)
+        return clusters
+
+    def blackout_end(self, at: datetime) -> Optional[datetime]:
+        """ End of the global blackout(s) covering 'at', 'at' if there is none, None if it never ends. """
+        end = at
+        limit = at + SEARCH_HORIZON
+        while end < limit:
+            active = [w for w in self.blackouts if w.spec.matches(end)]
+            if not active:
+                return end
+            ends = [w.spec.next_mismatch(end) for w in active]
+            if None in ends:
+                return None
+            end = max(ends)
+
+        # Blackouts chained over the whole horizon never end
+        return None
+
+    def in_blackout(self, at: datetime) -> bool:
+        return any(w.spec.matches(at) for w in self.blackouts)
+
+    def next_fire(self, now: datetime) -> Tuple[Optional[datetime], ScheduleWindow]:
+        window = self.active_window(now)
+        wait_time = random.randint(window.vmotion_interval_min_seconds, window.vmotion_interval_max_seconds)
+        fire_at = now + timedelta(seconds=wait_time)
+
+        # A migration window opening before the random wait expires
+        # fires on its own schedule, starting when it opens.
+        for candidate in self.windows:
+            if candidate is window:
+                continue
+            start = candidate.spec.next_match(now + timedelta(minutes=1))
+            if start and start < fire_at and self.active_window(start) is candidate:
+                fire_at = start
+
+        # Never fire (or wake up) during a global blackout
+        end = self.blackout_end(fire_at)
+        if end is None:
+            return None, window
+        if end != fire_at:
+            logger.debug(f"next_fire: {fire_at} is in a blackout, moving to {end}")
+            fire_at = end
+        return fire_at, self.active_window(fire_at)
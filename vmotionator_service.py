@@ -1,24 +1,36 @@
 import atexit
 import hashlib
+import json
 import logging
+import queue
 import random
 import re
 import signal
 import ssl
+import sys
 import threading
+import time
 
+from datetime import datetime
 from pyVim.connect import SmartConnect, Disconnect
 from pyVim.task import WaitForTask
 # noinspection PyUnresolvedReferences
 from pyVmomi import vim, vmodl
 from threading import Event
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
 from vmotionator_exception import VMotionatorException
+from vmotionator_inventory import DEFAULT_INVENTORY_CACHE_SECONDS, Inventory, VMRecord
+from vmotionator_schedule import Scheduler, ScheduleWindow
+from vmotionator_stats import DEFAULT_STATS_WINDOW, MigrationRecord, MigrationStats
 
 logger = logging.getLogger(__name__)
 logger_vmotion = logging.getLogger('vmotion')
 
+# Concurrent vMotions allowed per host by vSphere, based on the network speed
+VMOTION_HOST_MAX_CONCURRENCY_1GBE = 4
+VMOTION_HOST_MAX_CONCURRENCY_10GBE = 8
+
 
 class VMotionatorService(object):
     def __init__(self,
@@ -31,6 +43,10 @@ class VMotionatorService(object):
                  vcenter_password: str,
                  vcenter_port: int = 443,
                  vcenter_ssl_verify: bool = True,
+                 vmotion_concurrency: int = 0,
+                 schedule_windows: List[ScheduleWindow] = None,
+                 vmotion_stats_window: int = DEFAULT_STATS_WINDOW,
+                 inventory_cache_seconds: int = DEFAULT_INVENTORY_CACHE_SECONDS,
                  ):
         logger.debug(
             f"__init__: ["
@@ -42,7 +58,11 @@ class VMotionatorService(object):
             f"{vcenter_username}, "
             f"{self.hash(vcenter_password)}, "
             f"{vcenter_port}, "
-            f"{vcenter_ssl_verify}]")
+            f"{vcenter_ssl_verify}, "
+            f"{vmotion_concurrency}, "
+            f"{schedule_windows}, "
+            f"{vmotion_stats_window}, "
+            f"{inventory_cache_seconds}]")
 
         self.vmotion_interval_min_seconds = vmotion_interval_min_seconds
         self.vmotion_interval_max_seconds = vmotion_interval_max_seconds
@@ -53,6 +73,24 @@ class VMotionatorService(object):
         self.vcenter_password = vcenter_password
         self.vcenter_port = vcenter_port
         self.vcenter_ssl_verify = vcenter_ssl_verify
+        self.vmotion_concurrency = vmotion_concurrency
+        self.inventory_cache_seconds = inventory_cache_seconds
+        self.scheduler = Scheduler(default_window=ScheduleWindow(name="default",
+                                                                 schedule="* * * * *",
+                                                                 vmotion_interval_min_seconds=vmotion_interval_min_seconds,
+                                                                 vmotion_interval_max_seconds=vmotion_interval_max_seconds,
+                                                                 vmotion_vm_count=vmotion_vm_count,
+                                                                 vmotion_concurrency=vmotion_concurrency),
+                                   windows=schedule_windows)
+        self.inventory = Inventory()
+        self.stats = MigrationStats(window=vmotion_stats_window)
+        self.next_vmotion_at: Optional[datetime] = None
+        self.__si = None
+        self.__migrations: Dict[int, MigrationRecord] = {}
+        self.__migrations_lock = threading.Lock()
+        self.__requests = queue.Queue()
+        self.__paused = Event()
+        self.__wake = Event()
         self.__exit = Event()
 
     @classmethod
@@ -60,11 +98,11 @@ class VMotionatorService(object):
         return hashlib.sha256(bytes(data, "utf-8")).hexdigest()
 
     @classmethod
-    def filter_templates(cls, vms: List[vim.VirtualMachine]) -> List[vim.VirtualMachine]:
-        return [vm for vm in vms if not vm.config.template]
+    def filter_templates(cls, vms: List[VMRecord]) -> List[VMRecord]:
+        return [vm for vm in vms if not vm.template]
 
     @classmethod
-    def filter_vms(cls, vms: List[vim.VirtualMachine], exclusions: List[str]) -> List[vim.VirtualMachine]:
+    def filter_vms(cls, vms: List[VMRecord], exclusions: List[str]) -> List[VMRecord]:
         # Pre-compile regexes
         regexes = [re.compile(p) for p in exclusions]
 
@@ -99,73 +137,201 @@ class VMotionatorService(object):
                 and vmotion.netConfig)
 
     @classmethod
-    def __get_all_vms(cls, content):
-        container = content.viewManager.CreateContainerView(content.rootFolder, [vim.VirtualMachine], True)
-        return list(container.view)
+    def __get_all_vms(cls, content, inventory: Inventory, max_age_seconds: int, reload: bool = False) -> List[VMRecord]:
+        # Reuse the cached inventory until it is stale
+        age = inventory.age_seconds
+        if reload or age is None or age >= max_age_seconds:
+            inventory.load(content)
+        return inventory.vms
+
+    @classmethod
+    def __inventory_has(cls, inventory: Inventory, vm_names: Set[str]) -> bool:
+        return vm_names <= {vm.name for vm in inventory.vms}
+
+    @classmethod
+    def __get_cluster_for_vm(cls, vm: VMRecord, stub) -> vim.ClusterComputeResource:
+        return vim.ClusterComputeResource(vm.cluster, stub) if vm.cluster else None
 
     @classmethod
-    def __get_cluster_for_vm(cls, vm):
-        parent = vm.resourcePool.parent
-        while parent and not isinstance(parent, vim.ClusterComputeResource):
-            parent = parent.parent
-        return parent
+    def __get_eligible_hosts(cls, cluster, current_host: Optional[str]):
+        # Compare MoRef IDs, the proxies built from the inventory have no server GUID
+        return [host for host in cluster.host if host._moId != current_host and cls.__host_ready(host)]
 
     @classmethod
-    def __get_eligible_hosts(cls, cluster, current_host):
-        return [host for host in cluster.host if host != current_host and cls.__host_ready(host)]
+    def __get_host_max_concurrency(cls, host: vim.HostSystem) -> int:
+        # The vMotion NIC is not easily known, use the fastest physical NIC
+        try:
+            speeds = [pnic.linkSpeed.speedMb for pnic in host.config.network.pnic if pnic.linkSpeed]
+        except (AttributeError, vmodl.MethodFault):
+            speeds = []
+        if speeds and max(speeds) >= 10000:
+            return VMOTION_HOST_MAX_CONCURRENCY_10GBE
+        return VMOTION_HOST_MAX_CONCURRENCY_1GBE
+
+    def __query_vmotion_events(self, si, event_chain_id: Optional[int], record: MigrationRecord):
+        if event_chain_id is None:
+            return
+        try:
+            # Events logged by the relocate task share its event chain
+            filter_spec = vim.event.EventFilterSpec(eventChainId=event_chain_id)
+            record.add_events(si.content.eventManager.QueryEvents(filter_spec) or [])
+        except vmodl.MethodFault as e:
+            self._warning(f"__query_vmotion_events: Unable to query events for '{record.vm}': {e.msg}")
 
-    def __perform_vmotion(self, vm, destination_host):
-        self._debug(f"__perform_vmotion: {vm.name}' from '{vm.runtime.host.name}' to '{destination_host.name}.")
-        logger_vmotion.info(f"'{vm.name}' from '{vm.runtime.host.name}' to '{destination_host.name}'")
+    def __perform_vmotion(self, vm: VMRecord, destination_host, si, record: MigrationRecord):
+        self._debug(f"__perform_vmotion: {vm.name}' from '{record.source_host}' to '{record.destination_host}.")
+        logger_vmotion.info(f"'{vm.name}' from '{record.source_host}' to '{record.destination_host}'")
 
         # Relocate VM
+        vm_obj = vim.VirtualMachine(vm.moref, si._stub)
         relocate_spec = vim.vm.RelocateSpec(host=destination_host)
-        task = vm.Relocate(relocate_spec)
-        self.wait_for_task(task)
+        event_chain_id = None
+        record.mark_started()
+        try:
+            task = vm_obj.Relocate(relocate_spec)
+            state, error = self.wait_for_task(task, record=record)
+            info = task.info
+            record.task_start = info.startTime
+            record.task_end = info.completeTime
+            event_chain_id = info.eventChainId
+        except vmodl.MethodFault as e:
+            state, error = "error", e.msg
+        record.mark_completed(state=state, error=error)
+
+        # Collect vMotion events and statistics
+        self.__query_vmotion_events(si, event_chain_id, record)
+        self.stats.add(record)
+        logger_vmotion.debug(f"'{vm.name}' stats: {json.dumps(record.json())}")
+
+        if state != "success":
+            print(f"vMotion {state}: {vm.name} was not moved to {record.destination_host}")
+            logger_vmotion.warning(f"'{vm.name}' not moved to '{record.destination_host}' ({state}: {error})")
+            return
+
+        # Keep the cached inventory current
+        vm.host = sys.intern(destination_host._moId)
 
         # vMotion Complete
-        print(f"vMotion complete: {vm.name} moved to {destination_host.name}")
-        logger_vmotion.info(f"'{vm.name}' moved to '{destination_host.name}'")
+        print(f"vMotion complete: {vm.name} moved to {record.destination_host}")
+        logger_vmotion.info(f"'{vm.name}' moved to '{record.destination_host}' "
+                            f"in {record.duration_seconds:.1f}s (queued {record.queue_wait_seconds:.1f}s)")
 
-    def wait_for_task(self, task):
-        self._debug(f"wait_for_task: waiting for task '{ task.info.key }'")
+    def __perform_vmotion_limited(self, semaphore: threading.Semaphore, vm: VMRecord, destination_host, si,
+                                  record: MigrationRecord):
         try:
-            WaitForTask(task)
-        except vmodl.fault.RequestCanceled:
-            self._warning(f"wait_for_task: task '{task.info.key}' was cancelled")
-            return
-        self._debug(f"wait_for_task: task '{task.info.key}' completed")
+            with semaphore:
+                self.__perform_vmotion(vm, destination_host, si, record)
+        finally:
+            with self.__migrations_lock:
+                self.__migrations.pop(id(record), None)
+
+    def wait_for_task(self, task, record: MigrationRecord = None) -> Tuple[str, Optional[str]]:
+        """ Wait for the task and return its final state ('success', 'cancelled' or 'error') and error. """
+        key = task.info.key
+        self._debug(f"wait_for_task: waiting for task '{ key }'")
 
-    def perform_vmotion(self):
-        self._debug(f"perform_vmotion")
+        def on_progress(_task, progress):
+            if record is not None and isinstance(progress, int):
+                record.add_progress(progress)
+
+        try:
+            state = WaitForTask(task, onProgressUpdate=on_progress)
+        except vmodl.fault.RequestCanceled:
+            self._warning(f"wait_for_task: task '{key}' was cancelled")
+            return "cancelled", "RequestCanceled"
+        except vmodl.MethodFault as e:
+            self._error(f"wait_for_task: task '{key}' failed: {e.msg}")
+            return "error", e.msg
+
+        # WaitForTask stops early, without raising, when the task object is deleted
+        if state != vim.TaskInfo.State.success:
+            self._error(f"wait_for_task: task '{key}' ended in state '{state}'")
+            return "error", f"task ended in state '{state}'"
+        self._debug(f"wait_for_task: task '{key}' completed")
+        return "success", None
+
+    def __get_service_instance(self):
+        # Reuse the live session while it is valid
+        if self.__si is not None:
+            try:
+                if self.__si.content.sessionManager.currentSession:
+                    return self.__si
+            except (vmodl.MethodFault, OSError) as e:
+                self._debug(f"__get_service_instance: Session check failed: {e}")
+            self._info(f"__get_service_instance: vCenter session expired, reconnecting")
+            self.__disconnect()
 
         # Create SSL context
         if self.vcenter_ssl_verify:
-            self._debug(f"perform_vmotion: Creating default ssl context")
+            self._debug(f"__get_service_instance: Creating default ssl context")
             context = ssl.create_default_context()
         else:
-            self._debug(f"perform_vmotion: Creating an unverified ssl context")
+            self._debug(f"__get_service_instance: Creating an unverified ssl context")
             context = ssl._create_unverified_context()
 
         # Connect to vCenter
-        self._debug(f"perform_vmotion: Connecting to vCenter server ")
-        si = SmartConnect(host=self.vcenter_server,
-                          user=self.vcenter_username,
-                          pwd=self.vcenter_password,
-                          port=self.vcenter_port,
-                          sslContext=context)
+        self._debug(f"__get_service_instance: Connecting to vCenter server ")
+        self.__si = SmartConnect(host=self.vcenter_server,
+                                 user=self.vcenter_username,
+                                 pwd=self.vcenter_password,
+                                 port=self.vcenter_port,
+                                 sslContext=context)
 
         # Setup cleanup
-        atexit.register(Disconnect, si)
+        atexit.unregister(self.__disconnect)
+        atexit.register(self.__disconnect)
+        return self.__si
+
+    def __disconnect(self):
+        if self.__si is None:
+            return
+        self._debug(f"__disconnect: Disconnecting from vCenter server")
+        try:
+            Disconnect(self.__si)
+        except (vmodl.MethodFault, OSError) as e:
+            self._debug(f"__disconnect: {e}")
+        self.__si = None
+
+    def perform_vmotion(self,
+                        vm_count: int = None,
+                        concurrency: int = None,
+                        excluded_clusters: Set[str] = None,
+                        vm_names: List[str] = None,
+                        host_names: List[str] = None,
+                        join_timeout: Optional[float] = 300) -> List[MigrationRecord]:
+        """
+        Migrate 'vm_count' random VMs, or the VMs named in 'vm_names' and
+        all the VMs running on the hosts in 'host_names' when given.
+
+        VMs moved off 'host_names' go to the least loaded eligible host of
+        their cluster. Their 'concurrency' applies per source host and
+        defaults to the maximum concurrency of the host, not to the
+        configured vmotion_concurrency.
+        """
+        vm_count = vm_count or self.vmotion_vm_count
+        if concurrency is None and not host_names:
+            concurrency = self.vmotion_concurrency
+        excluded_clusters = excluded_clusters or set()
+        vm_names = set(vm_names or [])
+        host_names = set(host_names or [])
+        self._debug(f"perform_vmotion: [{vm_count}, {concurrency}, {excluded_clusters}, {vm_names}, {host_names}]")
+
+        # Connect to vCenter
+        si = self.__get_service_instance()
 
         # Get content from vCenter server
         content = si.RetrieveContent()
 
-        # Get VMS from vCenter server
-        all_vms = self.__get_all_vms(content)
+        # Get VMS from vCenter server, evacuations are always planned on a
+        # fresh inventory as the VMs running on the hosts change with DRS
+        loaded_at = self.inventory.loaded_at
+        all_vms = self.__get_all_vms(content, self.inventory, self.inventory_cache_seconds, reload=bool(host_names))
+        if vm_names and not host_names and not self.__inventory_has(self.inventory, vm_names):
+            self._debug(f"perform_vmotion: Requested VM(s) not in the cached inventory, reloading")
+            all_vms = self.__get_all_vms(content, self.inventory, self.inventory_cache_seconds, reload=True)
         if not all_vms:
             self._error("perform_vmotion: No virtual machines found.")
-            return
+            return []
         self._info(f"perform_vmotion: Found {len(all_vms)} virtual machines.")
         self._debug(f"perform_vmotion: All VMS: '{", ".join([vm.name for vm in all_vms])}'")
 
@@ -179,40 +345,115 @@ class VMotionatorService(object):
         self._info(f"perform_vmotion: Excluded {len(vms) - len(included_vms)} virtual machines.")
         self._debug(f"perform_vmotion: Included VMS: '{", ".join([vm.name for vm in included_vms])}'")
 
-        # Pick random non-excluded VMs to migrate
-        print(f"Picking {self.vmotion_vm_count} VM to vMotion")
-        random_vms = random.sample(included_vms, self.vmotion_vm_count)
+        # Remove VMs in clusters under a blackout
+        if excluded_clusters:
+            vms = included_vms
+            included_vms = [vm for vm in vms if self.inventory.cluster_name(vm.cluster) not in excluded_clusters]
+            self._info(f"perform_vmotion: Excluded {len(vms) - len(included_vms)} virtual machines "
+                       f"in blackout clusters [{", ".join(sorted(excluded_clusters))}].")
+
+        if vm_names or host_names:
+            # Pick the requested VMs
+            random_vms = [vm for vm in included_vms
+                          if vm.name in vm_names or self.inventory.host_name(vm.host) in host_names]
+            missing = vm_names - {vm.name for vm in random_vms}
+            if missing:
+                self._warning(f"perform_vmotion: VM(s) not found or excluded: {", ".join(sorted(missing))}")
+            vm_count = len(random_vms)
+        else:
+            # Pick random non-excluded VMs to migrate
+            vm_count = min(vm_count, len(included_vms))
+            print(f"Picking {vm_count} VM to vMotion")
+            random_vms = random.sample(included_vms, vm_count)
+
+        # The cached inventory only lists the candidates, read the current
+        # host of the selected VMs before picking their source and target
+        if self.inventory.loaded_at == loaded_at:
+            selected_vms = random_vms
+            random_vms = [vm for vm in self.inventory.refresh(content, selected_vms)
+                          if self.inventory.cluster_name(vm.cluster) not in excluded_clusters]
+            if len(random_vms) != len(selected_vms):
+                self._warning(f"perform_vmotion: Skipping {len(selected_vms) - len(random_vms)} VM(s) removed "
+                              f"or moved to a blackout cluster since the inventory was loaded")
+            vm_count = len(random_vms)
         print(f"Selected VM(s) {", ".join([random_vm.name for random_vm in random_vms])}")
         self._info(f"perform_vmotion: Selected VM(s): {", ".join([random_vm.name for random_vm in random_vms])}")
 
+        # Limit the number of concurrent vMotions, per source host when evacuating
+        semaphore = threading.BoundedSemaphore(concurrency or max(vm_count, 1))
+        host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+        # Number of VMs per host, used to balance the evacuated VMs
+        host_load: Dict[str, int] = {}
+        if host_names:
+            for vm in all_vms:
+                if vm.power_state == "poweredOn":
+                    host_load[vm.host] = host_load.get(vm.host, 0) + 1
+
         # Create vMotion threads
+        eligible_hosts_cache: Dict[Tuple[str, str], list] = {}
         threads = []
+        records = []
         for random_vm in random_vms:
 
             # Find VM cluster
             self._debug(f"perform_vmotion: Migrating VM '{random_vm.name}'")
-            cluster = self.__get_cluster_for_vm(random_vm)
+            cluster = self.__get_cluster_for_vm(random_vm, si._stub)
             if not cluster:
                 self._error(f"perform_vmotion: Cluster not found for VM '{random_vm.name}'")
-                return
-            self._debug(f"perform_vmotion: Cluster for VM '{random_vm.name}' is '{cluster.name}'")
+                continue
+            cluster_name = self.inventory.cluster_name(random_vm.cluster)
+            self._debug(f"perform_vmotion: Cluster for VM '{random_vm.name}' is '{cluster_name}'")
 
             # Find target hosts in VM cluster
-            self._debug(f"perform_vmotion: Finding eligible hosts in cluster '{cluster.name}'")
-            eligible_hosts = self.__get_eligible_hosts(cluster, random_vm.runtime.host)
+            self._debug(f"perform_vmotion: Finding eligible hosts in cluster '{cluster_name}'")
+            current_host = vim.HostSystem(random_vm.host, si._stub) if random_vm.host else None
+            key = (random_vm.cluster, random_vm.host)
+            if key not in eligible_hosts_cache:
+                eligible_hosts_cache[key] = [host for host in self.__get_eligible_hosts(cluster, random_vm.host)
+                                             if self.inventory.host_name(host._moId) not in host_names]
+            eligible_hosts = eligible_hosts_cache[key]
             if not eligible_hosts:
                 self._error(f"perform_vmotion: No eligible hosts found for VM '{random_vm.name}'")
-                return
-            self._debug(f"perform_vmotion: Eligible hosts: [{", ".join([host.name for host in eligible_hosts])}]")
-
-            # Pick a random target host in the VM cluster
-            target_host = random.choice(eligible_hosts)
-            self._debug(f"perform_vmotion: Target host for '{random_vm.name}' is '{target_host.name}'")
+                continue
+            self._debug(f"perform_vmotion: Eligible hosts: "
+                        f"[{", ".join([self.inventory.host_name(host._moId) for host in eligible_hosts])}]")
+
+            if host_names:
+                # Pick the least loaded target host in the VM cluster
+                target_host = min(eligible_hosts, key=lambda host: host_load.get(host._moId, 0))
+                host_load[target_host._moId] = host_load.get(target_host._moId, 0) + 1
+
+                # Limit the vMotions per source host, to its maximum concurrency by default
+                if current_host is not None:
+                    if random_vm.host not in host_semaphores:
+                        host_concurrency = concurrency or self.__get_host_max_concurrency(current_host)
+                        self._debug(f"perform_vmotion: Host '{self.inventory.host_name(random_vm.host)}' "
+                                    f"concurrency is {host_concurrency}")
+                        host_semaphores[random_vm.host] = threading.BoundedSemaphore(host_concurrency)
+                    vm_semaphore = host_semaphores[random_vm.host]
+                else:
+                    vm_semaphore = semaphore
+            else:
+                # Pick a random target host in the VM cluster
+                target_host = random.choice(eligible_hosts)
+                vm_semaphore = semaphore
+            target_host_name = self.inventory.host_name(target_host._moId)
+            self._debug(f"perform_vmotion: Target host for '{random_vm.name}' is '{target_host_name}'")
 
             # Create and append thread
-            self._debug(f"perform_vmotion: Creating thread to vMotion {random_vm.name}' to '{target_host.name}'")
-            thread = threading.Thread(target=self.__perform_vmotion, args=(random_vm, target_host, ))
+            self._debug(f"perform_vmotion: Creating thread to vMotion {random_vm.name}' to '{target_host_name}'")
+            record = MigrationRecord(vm=random_vm.name,
+                                     cluster=cluster_name,
+                                     source_host=self.inventory.host_name(random_vm.host),
+                                     destination_host=target_host_name,
+                                     queued_at=time.monotonic())
+            with self.__migrations_lock:
+                self.__migrations[id(record)] = record
+            thread = threading.Thread(target=self.__perform_vmotion_limited,
+                                      args=(vm_semaphore, random_vm, target_host, si, record, ))
             threads.append(thread)
+            records.append(record)
 
         # Perform vMotions
         for thread in threads:
@@ -223,10 +464,128 @@ class VMotionatorService(object):
         self._debug(f"perform_vmotion: Waiting for threads to complete'")
         for thread in threads:
             self._debug(f"perform_vmotion: Waiting on thread '{thread.name}'")
-            thread.join(timeout=300)
-
-        # Disconnect
-        Disconnect(si)
+            thread.join(timeout=join_timeout)
+
+        # Log the rolling vMotion statistics
+        self._info(f"perform_vmotion: vMotion statistics: {json.dumps(self.stats.json())}")
+        return records
+
+    def evacuate_hosts(self,
+                       host_names: List[str],
+                       concurrency: int = None) -> Tuple[float, List[MigrationRecord], bool]:
+        """
+        Move all the VMs off 'host_names' and return the evacuation wall
+        time, the vMotion records and whether the hosts were emptied.
+
+        The evacuation fails when a host is unknown, when no VM runs on the
+        hosts or when a VM (other than templates and excluded VMs) is left.
+        """
+        self._info(f"evacuate_hosts: Evacuating host(s) {", ".join(host_names)}")
+        start = time.monotonic()
+        records = self.perform_vmotion(concurrency=concurrency, host_names=host_names, join_timeout=None)
+        wall_time = time.monotonic() - start
+
+        failed = [record for record in records if record.state != "success"]
+        print(f"Evacuated {", ".join(host_names)}: {len(records) - len(failed)}/{len(records)} VM(s) "
+              f"moved in {wall_time:.1f} seconds")
+        self._info(f"evacuate_hosts: {len(records) - len(failed)}/{len(records)} VM(s) moved off "
+                   f"{", ".join(host_names)} in {wall_time:.1f} seconds (concurrency per host: {concurrency or "host maximum"})")
+        logger_vmotion.info(f"Evacuated {", ".join(host_names)} in {wall_time:.1f} seconds "
+                            f"({len(records) - len(failed)}/{len(records)} VM(s) moved)")
+        for record in failed:
+            self._warning(f"evacuate_hosts: '{record.vm}' was not moved ({record.state}: {record.error})")
+
+        # Check the hosts on a fresh inventory, whatever still runs on them
+        # was skipped, failed or was moved there while evacuating
+        content = self.__get_service_instance().RetrieveContent()
+        self.__get_all_vms(content, self.inventory, self.inventory_cache_seconds, reload=True)
+        unknown = set(host_names) - set(self.inventory.host_names.values())
+        remaining = [vm.name for vm in self.filter_vms(vms=self.filter_templates(vms=self.inventory.vms),
+                                                       exclusions=self.vmotion_vm_exclusions)
+                     if self.inventory.host_name(vm.host) in host_names]
+        if unknown:
+            print(f"Host(s) not found: {", ".join(sorted(unknown))}")
+            self._error(f"evacuate_hosts: Host(s) not found: {", ".join(sorted(unknown))}")
+        if not records and not remaining:
+            print(f"No VM to evacuate on {", ".join(host_names)}")
+            self._error(f"evacuate_hosts: No VM found on host(s) {", ".join(host_names)}")
+        if remaining:
+            print(f"VM(s) left on {", ".join(host_names)}: {", ".join(remaining)}")
+            self._error(f"evacuate_hosts: VM(s) left on host(s) {", ".join(host_names)}: {", ".join(remaining)}")
+        return wall_time, records, bool(records) and not failed and not remaining and not unknown
+
+    def status(self) -> dict:
+        with self.__migrations_lock:
+            migrations = list(self.__migrations.values())
+        now = time.monotonic()
+        age = self.inventory.age_seconds
+        paused = self.__paused.is_set()
+        return {
+            "paused": paused,
+            "next_vmotion": self.next_vmotion_at.isoformat() if self.next_vmotion_at and not paused else None,
+            "queue_depth": self.__requests.qsize(),
+            "queued_vmotions": len([r for r in migrations if r.started_at is None]),
+            "in_flight": [{"vm": r.vm,
+                           "source_host": r.source_host,
+                           "destination_host": r.destination_host,
+                           "elapsed_seconds": round(now - r.started_at, 1),
+                           "progress": r.progress[-1][1] if r.progress else 0}
+                          for r in migrations if r.started_at is not None],
+            "inventory_vm_count": len(self.inventory),
+            "inventory_age_seconds": round(age, 1) if age is not None else None,
+        }
+
+    def __request(self, kind: str, value=None):
+        self._info(f"__request: Received '{kind}' request: {value}")
+        self.__requests.put((kind, value))
+        self.__wake.set()
+
+    def request_batch(self, count: int = None):
+        if self.scheduler.in_blackout(datetime.now()):
+            raise VMotionatorException("vMotions are suspended by a blackout window")
+        self.__request("batch", count)
+
+    def request_vms(self, vm_names: List[str]):
+        self.__request("vms", vm_names)
+
+    def request_hosts(self, host_names: List[str]):
+        self.__request("hosts", host_names)
+
+    def pause(self):
+        self._info(f"pause: Pausing scheduled vMotions")
+        self.__paused.set()
+        self.__wake.set()
+
+    def resume(self):
+        self._info(f"resume: Resuming scheduled vMotions")
+        self.__paused.clear()
+        self.__wake.set()
+
+    def __process_requests(self):
+        while not self.__exit.is_set():
+            try:
+                kind, value = self.__requests.get_nowait()
+            except queue.Empty:
+                return
+            print(f"Performing requested vMotions ({kind})")
+            self._info(f"__process_requests: Performing '{kind}' request: {value}")
+            match kind:
+                case "batch":
+                    # On demand batches follow the active window and the
+                    # blackouts, like scheduled ones
+                    now = datetime.now()
+                    if self.scheduler.in_blackout(now):
+                        self._warning(f"__process_requests: Skipping batch request, blackout window is active")
+                        continue
+                    window = self.scheduler.active_window(now)
+                    self.perform_vmotion(vm_count=value or window.vmotion_vm_count,
+                                         concurrency=window.vmotion_concurrency,
+                                         excluded_clusters=self.scheduler.blackout_clusters(now))
+                # Requested VMs and hosts are operator overrides of the blackouts
+                case "vms":
+                    self.perform_vmotion(vm_names=value)
+                case "hosts":
+                    self.evacuate_hosts(host_names=value)
 
     # noinspection PyBroadException
     def run(self):
@@ -238,30 +597,52 @@ class VMotionatorService(object):
 
         # noinspection PyBroadException
         try:
+            fire_at, window = None, None
             while not self.__exit.is_set():
 
-                # Select a random wait interval
-                # We do this to create some variability in the VM
-                # migration intervals.
-                self._debug(f"run: selecting random wait time between "
-                            f"{self.vmotion_interval_min_seconds} and "
-                            f"{self.vmotion_interval_max_seconds}")
-                wait_time = random.randint(self.vmotion_interval_min_seconds, self.vmotion_interval_max_seconds)
+                # Select the next vMotion time from the active window.
+                # The wait time is random within the window interval to
+                # create some variability in the VM migration intervals,
+                # and is pushed past any global blackout. The plan is kept
+                # when we wake up for on demand requests.
+                if fire_at is None and not self.__paused.is_set():
+                    now = datetime.now()
+                    fire_at, window = self.scheduler.next_fire(now)
+                    if fire_at is None:
+                        print(f"Blackout never ends. Waiting for requests")
+                        self._warning(f"run: Blackout never ends. Waiting for requests")
+                    else:
+                        wait_time = max((fire_at - now).total_seconds(), 0)
+                        self._debug(f"run: next vMotion at {fire_at} in window '{window.name}'")
+                        print(f"Waiting {wait_time:.0f} seconds")
+                        self._info(f"Sleeping for {wait_time:.0f} seconds")
+                self.next_vmotion_at = fire_at
+
+                # Sleep until the next vMotion, a request or a stop
+                wait_time = max((fire_at - datetime.now()).total_seconds(), 0) if fire_at else None
+                self.__wake.wait(wait_time)
+                self.__wake.clear()
+
+                if self.__exit.is_set():
+                    # Stop requested during wait
+                    print(f"Stop requested. Skipping vMotions")
+                    self._info(f"Stop requested. Skipping vMotions")
+                    break
 
-                # Sleep for 'wait_time'
-                print(f"Waiting {wait_time} seconds")
-                self._info(f"Sleeping for {wait_time} seconds")
-                self.__exit.wait(wait_time)
+                # Perform on demand vMotions
+                self.__process_requests()
 
-                if not self.__exit.is_set():
+                if self.__paused.is_set():
+                    # Drop the plan, a new one is made on resume
+                    fire_at = None
+                elif fire_at and datetime.now() >= fire_at:
                     # Perform random vMotions
                     print(f"Performing vMotions")
-                    self._info(f"Performing random vMotions")
-                    self.perform_vmotion()
-                else:
-                    # Stop requested during wait
-                    print(f"Stop requested. Skipping vMotions")
-                    self._info(f"Stop requested. Skipping vMotions")
+                    self._info(f"Performing random vMotions (window '{window.name}')")
+                    self.perform_vmotion(vm_count=window.vmotion_vm_count,
+                                         concurrency=window.vmotion_concurrency,
+                                         excluded_clusters=self.scheduler.blackout_clusters(datetime.now()))
+                    fire_at = None
 
         except VMotionatorException as e:
             self._critical(f"run: {e}")
@@ -274,6 +655,7 @@ class VMotionatorService(object):
 
         finally:
             self._debug(f"run: Cleaning up")
+            self.__disconnect()
 
     # noinspection PyUnusedLocal
     def stop(self, signum=None, frame=None):
@@ -281,3 +663,4 @@ class VMotionatorService(object):
         print(f"Received stop request ({signame})")
         self._debug(f"stop: Received stop request from {signame}")
         self.__exit.set()
+        self.__wake.set()
@@ -0,0 +1,182 @@
+import logging
+import math
+import threading
+import time
+
+from collections import deque
+from datetime import datetime
+# noinspection PyUnresolvedReferences
+from pyVmomi import vim
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATS_WINDOW = 100      # number of migrations kept per cluster / host pair
+PERCENTILES = (50, 90, 99)
+MIGRATION_EVENTS = (vim.event.VmBeingHotMigratedEvent,
+                    vim.event.VmEmigratingEvent,
+                    vim.event.VmMigratedEvent,
+                    vim.event.VmFailedMigrateEvent)
+METRICS = ("queue_wait_seconds", "duration_seconds", "stun_time_seconds", "throughput_bytes_per_second")
+
+
+class MigrationRecord(object):
+    """ Performance data captured for a single vMotion. """
+    __slots__ = ("vm", "cluster", "source_host", "destination_host",
+                 "queued_at", "started_at", "completed_at", "task_start", "task_end",
+                 "progress", "state", "error", "events", "stun_time_seconds", "bytes_transferred")
+
+    def __init__(self, vm: str, cluster: str, source_host: str, destination_host: str, queued_at: float = None):
+        self.vm = vm
+        self.cluster = cluster
+        self.source_host = source_host
+        self.destination_host = destination_host
+        self.queued_at = queued_at if queued_at is not None else time.monotonic()
+        self.started_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.task_start: Optional[datetime] = None
+        self.task_end: Optional[datetime] = None
+        self.progress: List[Tuple[float, int]] = []
+        self.state: Optional[str] = None
+        self.error: Optional[str] = None
+        self.events: List[str] = []
+        self.stun_time_seconds: Optional[float] = None
+        self.bytes_transferred: Optional[int] = None
+
+    @property
+    def host_pair(self) -> str:
+        return f"{self.source_host} -> {self.destination_host}"
+
+    @property
+    def queue_wait_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.queued_at
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        # Prefer the vCenter task times, fall back to the local clock
+        if self.task_start and self.task_end:
+            return (self.task_end - self.task_start).total_seconds()
+        if self.started_at is None or self.completed_at is None:
+            return None
+        return self.completed_at - self.started_at
+
+    @property
+    def throughput_bytes_per_second(self) -> Optional[float]:
+        duration = self.duration_seconds
+        if not self.bytes_transferred or not duration:
+            return None
+        return self.bytes_transferred / duration
+
+    def mark_started(self):
+        self.started_at = time.monotonic()
+
+    def mark_completed(self, state: str, error: str = None):
+        self.completed_at = time.monotonic()
+        self.state = state
+        self.error = error
+
+    def add_progress(self, percent: int):
+        start = self.started_at if self.started_at is not None else self.queued_at
+        self.progress.append((round(time.monotonic() - start, 3), percent))
+
+    def add_events(self, events: List[vim.event.Event]):
+        """
+        Keep the names of the vMotion events of the migration.
+
+        vCenter events do not report the stun time nor the transferred bytes
+        of a vMotion, these are only logged by the ESXi hosts (vmware.log and
+        vmkernel.log). 'stun_time_seconds' and 'bytes_transferred' stay None
+        unless they are set from such a source.
+        """
+        for event in events:
+            if isinstance(event, MIGRATION_EVENTS):
+                self.events.append(type(event).__name__.split(".")[-1])
+
+    def json(self):
+        return {
+            "vm": self.vm,
+            "cluster": self.cluster,
+            "source_host": self.source_host,
+            "destination_host": self.destination_host,
+            "state": self.state,
+            "error": self.error,
+            "queue_wait_seconds": self.queue_wait_seconds,
+            "task_start": self.task_start.isoformat() if self.task_start else None,
+            "task_end": self.task_end.isoformat() if self.task_end else None,
+            "duration_seconds": self.duration_seconds,
+            "progress": self.progress,
+            "events": self.events,
+            "stun_time_seconds": self.stun_time_seconds,
+            "bytes_transferred": self.bytes_transferred,
+            "throughput_bytes_per_second": self.throughput_bytes_per_second,
+        }
+
+
+class RollingStats(object):
+    """ Fixed size window of samples with nearest-rank percentiles. """
+    def __init__(self, window: int = DEFAULT_STATS_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, value: Optional[float]):
+        if value is not None:
+            self.samples.append(value)
+
+    @classmethod
+    def nearest_rank(cls, ordered: List[float], p: float) -> float:
+        return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        return self.nearest_rank(sorted(self.samples), p)
+
+    def json(self):
+        ordered = sorted(self.samples)
+        result = {"count": len(ordered)}
+        for p in PERCENTILES:
+            result[f"p{p}"] = round(self.nearest_rank(ordered, p), 3) if ordered else None
+        return result
+
+
+class MigrationStats(object):
+    """
+    Rolling migration statistics per cluster and per source/destination
+    host pair. Safe to update from the vMotion threads.
+    """
+    def __init__(self, window: int = DEFAULT_STATS_WINDOW):
+        self.window = window
+        self.clusters: Dict[str, Dict[str, RollingStats]] = {}
+        self.host_pairs: Dict[str, Dict[str, RollingStats]] = {}
+        self.states: Dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def __metrics(self, table: Dict[str, Dict[str, RollingStats]], key: str) -> Dict[str, RollingStats]:
+        metrics = table.get(key)
+        if metrics is None:
+            metrics = table[key] = {metric: RollingStats(self.window) for metric in METRICS}
+        return metrics
+
+    def add(self, record: MigrationRecord):
+        with self.__lock:
+            self.states[record.state] = self.states.get(record.state, 0) + 1
+            for metrics in (self.__metrics(self.clusters, record.cluster),
+                            self.__metrics(self.host_pairs, record.host_pair)):
+                metrics["queue_wait_seconds"].add(record.queue_wait_seconds)
+
+                # Only successful migrations count towards the timings
+                if record.state == "success":
+                    for metric in METRICS[1:]:
+                        metrics[metric].add(getattr(record, metric))
+
+    def json(self):
+        with self.__lock:
+            return {
+                "states": dict(self.states),
+                "clusters": {key: {m: s.json() for m, s in metrics.items()} for key, metrics in self.clusters.items()},
+                "host_pairs": {key: {m: s.json() for m, s in metrics.items()} for key, metrics in self.host_pairs.items()},
+            }